@@ -1,6 +1,50 @@
 import pandas as pd
 import numpy as np
-from typing import Dict, Any, List
+from typing import Dict, Any
+
+from data_loader import load_price_data
+from numba_compat import njit
+
+
+NS_PER_DAY = 86_400_000_000_000
+EXIT_REASONS = np.array(["rule_exit", "take_profit", "stop_loss"])
+
+
+@njit(cache=True)
+def _simulate(close, dates_i8, entry_sig, exit_sig, side):
+    """
+    Single-position state machine over one symbol's bars.
+    Returns the per-bar position plus flat trade arrays; only the first `count`
+    entries of the trade arrays are filled.
+    """
+    n = close.shape[0]
+    cap = n // 2 + 1
+    positions = np.zeros(n, dtype=np.int8)
+    entry_idx_arr = np.empty(cap, dtype=np.int64)
+    exit_idx_arr = np.empty(cap, dtype=np.int64)
+    entry_px_arr = np.empty(cap, dtype=np.float64)
+    exit_px_arr = np.empty(cap, dtype=np.float64)
+    hold_days = np.empty(cap, dtype=np.int64)
+
+    count = 0
+    position = 0
+    entry_i = 0
+    for i in range(n):
+        if position == 0 and entry_sig[i]:
+            position = side
+            entry_i = i
+        elif position != 0 and exit_sig[i]:
+            entry_idx_arr[count] = entry_i
+            exit_idx_arr[count] = i
+            entry_px_arr[count] = close[entry_i]
+            exit_px_arr[count] = close[i]
+            hold_days[count] = (dates_i8[i] - dates_i8[entry_i]) // NS_PER_DAY
+            count += 1
+            position = 0
+        positions[i] = position
+
+    return (positions, entry_idx_arr, exit_idx_arr, entry_px_arr, exit_px_arr,
+            hold_days, count)
 
 
 class Backtester:
@@ -16,32 +60,31 @@ class Backtester:
     def __init__(self, csv_path: str):
         self.csv_path = csv_path
         self.data = self._load_and_validate_data(csv_path)
+        # Per-symbol slices, split once so run() doesn't rescan the whole frame
+        self._by_symbol: Dict[str, pd.DataFrame] = dict(tuple(self.data.groupby("symbol", sort=False)))
 
     # ---------- data load ----------
     def _load_and_validate_data(self, csv_path: str) -> pd.DataFrame:
         print(f"📂 Loading data from: {csv_path}")
         try:
-            df = pd.read_csv(csv_path)
+            # columns normalized + renamed, dates parsed (cached as parquet)
+            df = load_price_data(csv_path)
         except FileNotFoundError:
             raise FileNotFoundError(f"❌ CSV file not found: {csv_path}")
         except Exception as e:
             raise ValueError(f"❌ Error reading CSV: {e}")
 
-        # Normalize + rename
-        df.columns = [c.lower().strip() for c in df.columns]
-        df.rename(columns={"ticker": "symbol", "closeprice": "close", "openprice": "open"}, inplace=True)
-
         missing = self.REQUIRED_COLUMNS - set(df.columns)
         if missing:
             raise ValueError(f"❌ Missing required columns in CSV even after renaming: {missing}")
 
         # Dates
-        df["date"] = pd.to_datetime(df["date"], errors="coerce")
         if df["date"].isna().any():
             bad = int(df["date"].isna().sum())
             print(f"⚠️ Warning: {bad} rows have invalid dates and were dropped.")
             df = df.dropna(subset=["date"])
 
+        df["symbol"] = df["symbol"].astype(str).str.upper()
         df = df.drop_duplicates(subset=["symbol", "date"])
         df.sort_values(["symbol", "date"], inplace=True)
         print(f"✅ Data loaded successfully: {len(df):,} rows, {df['symbol'].nunique()} symbols.\n")
@@ -71,9 +114,11 @@ class Backtester:
         if not symbol:
             raise ValueError("❌ No symbol specified for backtest.")
 
-        df = self.data[self.data["symbol"].str.upper() == symbol].copy()
-        if df.empty:
+        df = self._by_symbol.get(symbol)
+        if df is None or df.empty:
             raise ValueError(f"❌ No data found for symbol '{symbol}'.")
+        # shallow copy: run() only adds columns, the cached slice stays untouched
+        df = df.copy(deep=False)
 
         # ENTRY
         econd = entry_rule["condition"]
@@ -99,91 +144,66 @@ class Backtester:
             take_profit = xcond.get("take_profit", None)
 
             df["exit_change"] = df["close"].pct_change(periods=x_period)
-
-            # Base exit rule
-            if x_dir == "down":
-                base_exit = df["exit_change"] <= -x_thr
-            elif x_dir == "up":
-                base_exit = df["exit_change"] >= x_thr
-            else:
-                base_exit = pd.Series(False, index=df.index)
-
-            sl_exit = (df["exit_change"] <= -stop_loss) if (stop_loss is not None) else pd.Series(False, index=df.index)
-            tp_exit = (df["exit_change"] >= take_profit) if (take_profit is not None) else pd.Series(False, index=df.index)
-
-            df["exit_signal"] = base_exit | sl_exit | tp_exit
-            df["exit_reason_base"] = base_exit
-            df["exit_reason_sl"] = sl_exit
-            df["exit_reason_tp"] = tp_exit
+            exit_change = df["exit_change"].to_numpy()
+
+            # Base exit rule, then OR stop/take into the same buffer
+            # (no threshold parsed -> the base rule never fires, stop/take still can)
+            exit_sig = np.zeros(len(df), dtype=bool)
+            if x_thr is not None:
+                if x_dir == "down":
+                    np.less_equal(exit_change, -x_thr, out=exit_sig)
+                elif x_dir == "up":
+                    np.greater_equal(exit_change, x_thr, out=exit_sig)
+            if stop_loss is not None:
+                np.logical_or(exit_sig, exit_change <= -stop_loss, out=exit_sig)
+            if take_profit is not None:
+                np.logical_or(exit_sig, exit_change >= take_profit, out=exit_sig)
+            df["exit_signal"] = exit_sig
         else:
             df["exit_signal"] = False
-            df["exit_reason_base"] = False
-            df["exit_reason_sl"] = False
-            df["exit_reason_tp"] = False
 
         # ====== Simulate trades & build ledger ======
-        position = 0
-        positions: List[int] = []
-        ledger = []  # each item: dict with entry/exit details
-        entry_idx = None
-        entry_price = None
-        entry_date = None
-        side = 0  # +1 for long, -1 for short
-
-        for i in range(len(df)):
-            price = df.iloc[i]["close"]
-            date = df.iloc[i]["date"]
-
-            if position == 0 and df.iloc[i]["entry_signal"]:
-                # open
-                side = 1 if entry_rule["action"] == "buy" else -1
-                position = side
-                entry_idx = i
-                entry_price = price
-                entry_date = date
-
-            elif position != 0:
-                # check exit
-                if df.iloc[i]["exit_signal"]:
-                    reason = "rule_exit"
-                    if bool(df.iloc[i].get("exit_reason_tp", False)):
-                        reason = "take_profit"
-                    elif bool(df.iloc[i].get("exit_reason_sl", False)):
-                        reason = "stop_loss"
-
-                    # close
-                    exit_price = price
-                    exit_date = date
-                    gross_ret = (exit_price / entry_price - 1.0) * side
-                    hold_days = int((exit_date - entry_date).days)
-
-                    ledger.append({
-                        "symbol": symbol,
-                        "side": "long" if side == 1 else "short",
-                        "entry_date": entry_date,
-                        "entry_price": float(entry_price),
-                        "exit_date": exit_date,
-                        "exit_price": float(exit_price),
-                        "return": float(gross_ret),
-                        "holding_days": hold_days,
-                        "exit_reason": reason
-                    })
-
-                    # reset
-                    position = 0
-                    entry_idx = entry_price = entry_date = None
-                    side = 0
-
-            positions.append(position)
-
-        # position series + equity from daily returns
+        side = 1 if entry_rule["action"] == "buy" else -1  # +1 for long, -1 for short
+        dates = df["date"].to_numpy(dtype="datetime64[ns]")
+        (positions, entry_idx, exit_idx, entry_px, exit_px,
+         hold_days, k) = _simulate(
+            df["close"].to_numpy(dtype=np.float64),
+            dates.view("i8"),
+            df["entry_signal"].to_numpy(dtype=bool),
+            df["exit_signal"].to_numpy(dtype=bool),
+            side,
+        )
+        entry_idx, exit_idx = entry_idx[:k], exit_idx[:k]
+
+        # Exit reasons, classified on the exit bars only (take-profit wins over stop-loss)
+        reason_codes = np.zeros(k, dtype=np.int8)
+        if exit_rule:
+            exit_move = exit_change[exit_idx]
+            if stop_loss is not None:
+                reason_codes[exit_move <= -stop_loss] = 2
+            if take_profit is not None:
+                reason_codes[exit_move >= take_profit] = 1
+
+        # Metrics
+        entry_px, exit_px = entry_px[:k], exit_px[:k]
+        trade_rets = (exit_px / entry_px - 1.0) * side
+        trades_df = pd.DataFrame({
+            "symbol": symbol,
+            "side": "long" if side == 1 else "short",
+            "entry_date": dates[entry_idx],
+            "entry_price": entry_px,
+            "exit_date": dates[exit_idx],
+            "exit_price": exit_px,
+            "return": trade_rets,
+            "holding_days": hold_days[:k],
+            "exit_reason": EXIT_REASONS[reason_codes],
+        })
+
+        # position series + daily mark-to-market returns/equity (used by ReportGenerator)
         df["position"] = positions
         df["return"] = df["close"].pct_change() * df["position"].shift(1)
         df["equity"] = (1 + df["return"].fillna(0)).cumprod()
-
-        # Metrics
-        trades_df = pd.DataFrame(ledger)
-        total_return = (1 + df["return"].fillna(0)).prod() - 1
+        total_return = df["equity"].iloc[-1] - 1.0
         num_trades = len(trades_df)
         avg_entry_move = df.loc[df["entry_signal"], "entry_change"].mean() if df["entry_signal"].any() else 0.0
 
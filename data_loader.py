@@ -0,0 +1,49 @@
+import os
+import pandas as pd
+
+
+COLUMN_RENAMES = {
+    "ticker": "symbol",
+    "closeprice": "close",
+    "openprice": "open"
+}
+
+
+DATE_FORMAT = "%Y-%m-%d"
+
+
+def _parse_dates(raw: pd.Series) -> pd.Series:
+    # Fixed format takes pandas' C strptime path; only fall back to per-value
+    # format inference if some non-empty dates don't match it.
+    dates = pd.to_datetime(raw, format=DATE_FORMAT, cache=True, errors="coerce")
+    if (dates.isna() & raw.notna()).any():
+        dates = pd.to_datetime(raw, errors="coerce")
+    return dates
+
+
+def load_price_data(csv_path: str) -> pd.DataFrame:
+    """
+    Reads the price CSV with lower-cased/renamed columns and parsed dates.
+    The parsed frame is cached next to the CSV as `<csv_path>.parquet` and reused
+    while it is at least as new as the CSV, so later runs skip CSV tokenizing and
+    date parsing. Caching is best-effort: without a parquet engine (pyarrow) or
+    write access, this behaves like a plain CSV read.
+    """
+    pq_path = csv_path + ".parquet"
+    if os.path.exists(pq_path) and os.path.getmtime(pq_path) >= os.path.getmtime(csv_path):
+        try:
+            return pd.read_parquet(pq_path)
+        except (ImportError, OSError, ValueError):
+            pass  # unreadable cache: rebuild from the CSV
+
+    df = pd.read_csv(csv_path)
+    df.columns = [c.lower().strip() for c in df.columns]
+    df.rename(columns=COLUMN_RENAMES, inplace=True)
+    if "date" in df.columns:
+        df["date"] = _parse_dates(df["date"])
+
+    try:
+        df.to_parquet(pq_path, compression="zstd")
+    except (ImportError, OSError, ValueError):
+        pass
+    return df
@@ -1,26 +1,84 @@
 import pandas as pd
 import plotly.graph_objects as go
+import io
 import os
+import math
 from datetime import datetime
 import numpy as np
+from numba_compat import njit
 from strategy_parser import StrategyParser
 from portfolio_backtester import PortfolioBacktester
 
 
 # === Utility Functions ===
 
-def calculate_sharpe_ratio(returns, risk_free_rate=0.02):
-    if returns.std() == 0:
-        return 0
+@njit(cache=True)
+def _equity_stats(eq):
+    """
+    One pass over an equity curve: sum and sum of squares of the daily returns
+    (the first day counts as a 0 return) and the max drawdown.
+    """
+    n = eq.shape[0]
+    s = 0.0
+    s2 = 0.0
+    peak = eq[0]
+    max_dd = 0.0
+    for i in range(1, n):
+        r = eq[i] / eq[i - 1] - 1.0
+        s += r
+        s2 += r * r
+        if eq[i] > peak:
+            peak = eq[i]
+        dd = eq[i] / peak - 1.0
+        if dd < max_dd:
+            max_dd = dd
+    return s, s2, n, max_dd
+
+
+@njit(cache=True)
+def _last_qualifying_overlap(starts, ends, by_exit, by_entry, limit):
+    """
+    For each trade j, the largest qualifying row i overlapping it: i < limit[j]
+    (entered before exit_j) and exit_i > entry_j, or -1.
+    Queries go by entry descending while qualifying rows are added by exit
+    descending, so every added row already ends after entry_j; a Fenwick tree
+    over row numbers keeps the prefix max of the added rows, O(log N) per
+    insert and per query.
+    """
+    n = starts.shape[0]
+    tree = np.full(n + 1, -1, dtype=np.int64)
+    out = np.full(n, -1, dtype=np.int64)
+    k = 0
+    for j in by_entry:
+        while k < by_exit.shape[0] and ends[by_exit[k]] > starts[j]:
+            row = by_exit[k]
+            i = row + 1
+            while i <= n:
+                if tree[i] < row:
+                    tree[i] = row
+                i += i & -i
+            k += 1
+        best = -1
+        i = limit[j]
+        while i > 0:
+            if tree[i] > best:
+                best = tree[i]
+            i -= i & -i
+        out[j] = best
+    return out
+
+
+def calculate_equity_stats(equity, risk_free_rate=0.02):
+    """Sharpe ratio and max drawdown of an equity curve, fused into one pass."""
+    s, s2, n, max_drawdown = _equity_stats(np.asarray(equity, dtype=np.float64))
+    if n < 2:
+        return 0, max_drawdown
+    mean = s / n
+    var = (s2 - s * mean) / (n - 1)  # sample variance, as pandas computes it
+    if var <= 0:
+        return 0, max_drawdown
     daily_rf = (1 + risk_free_rate) ** (1 / 252) - 1
-    excess_returns = returns - daily_rf
-    return np.sqrt(252) * excess_returns.mean() / excess_returns.std()
-
-
-def calculate_max_drawdown(equity_series):
-    cumulative_max = equity_series.cummax()
-    drawdown = (equity_series - cumulative_max) / cumulative_max
-    return drawdown.min()
+    return math.sqrt(252) * (mean - daily_rf) / math.sqrt(var), max_drawdown
 
 
 def generate_plotly_equity_curve(equity_df):
@@ -45,31 +103,88 @@ def generate_plotly_equity_curve(equity_df):
     return fig.to_html(full_html=False, include_plotlyjs='cdn')
 
 
+def generate_trades_table_html(trades_df):
+    header = """
+    <table>
+        <tr>
+            <th>Group</th><th>Symbol</th><th>Entry Date</th><th>Exit Date</th>
+            <th>Entry Price</th><th>Exit Price</th><th>Return</th><th>Exit Reason</th>
+        </tr>
+    """
+    # Format whole columns at once, then zip them into rows (no iterrows, no += in a loop)
+    styles = np.where(trades_df["highlight"].to_numpy(dtype=bool), ' style="background-color:#e3f2fd;"', "")
+    groups = trades_df["group_id"].map(lambda g: g if pd.notna(g) else "").to_numpy()
+    entry_dates = trades_df["entry_date"].dt.strftime("%Y-%m-%d").to_numpy()
+    exit_dates = trades_df["exit_date"].dt.strftime("%Y-%m-%d").to_numpy()
+    entry_prices = np.char.mod("%.2f", trades_df["entry_price"].to_numpy(dtype=np.float64))
+    exit_prices = np.char.mod("%.2f", trades_df["exit_price"].to_numpy(dtype=np.float64))
+    returns = np.char.mod("%.4f", trades_df["return"].to_numpy(dtype=np.float64))
+
+    buf = io.StringIO()
+    buf.write(header)
+    buf.writelines(
+        f"""
+        <tr{style}>
+            <td>{group}</td>
+            <td>{symbol}</td>
+            <td>{entry_date}</td>
+            <td>{exit_date}</td>
+            <td>{entry_price}</td>
+            <td>{exit_price}</td>
+            <td>{ret}</td>
+            <td>{reason}</td>
+        </tr>
+        """
+        for style, group, symbol, entry_date, exit_date, entry_price, exit_price, ret, reason in zip(
+            styles, groups, trades_df["symbol"].to_numpy(), entry_dates, exit_dates,
+            entry_prices, exit_prices, returns, trades_df["exit_reason"].to_numpy()
+        )
+    )
+    buf.write("</table>")
+    return buf.getvalue()
+
+
 def assign_allocation_groups(trades_df, allocation):
     """
     Assign numeric group IDs for overlapping trades that reach full allocation.
     Highlight the final (full allocation) trade with a blue background.
+    Overlap counts come from binary searches over the sorted dates and the group
+    lookup from a Fenwick tree, O(N log N) overall.
     """
     trades_df = trades_df.sort_values(by="entry_date").reset_index(drop=True)
-    trades_df["group_id"] = None
-    trades_df["highlight"] = False
-
-    group_id = 1
-
-    for i, trade in trades_df.iterrows():
-        overlapping = trades_df[
-            (trades_df["entry_date"] < trade["exit_date"]) &
-            (trades_df["exit_date"] > trade["entry_date"])
-        ]
-        active_trades = len(overlapping)
-
-        # Check if this overlap reaches full allocation
-        if active_trades * allocation >= 1.0:
-            trades_df.loc[overlapping.index, "group_id"] = group_id
-            # The current trade that completed full allocation gets a highlight
-            trades_df.at[i, "highlight"] = True
-            group_id += 1
-
+    starts = trades_df["entry_date"].to_numpy(dtype="datetime64[ns]").view("i8")
+    ends = trades_df["exit_date"].to_numpy(dtype="datetime64[ns]").view("i8")
+
+    # Trades overlapping trade i: entry_j < exit_i and exit_j > entry_i, i.e. those
+    # entered before exit_i minus those already closed by entry_i.
+    sorted_ends = np.sort(ends)
+    active_trades = np.searchsorted(starts, ends, "left") - np.searchsorted(sorted_ends, starts, "right")
+    # a closed-by-entry_i trade was only counted if it also entered before exit_i;
+    # for same-day trades (exit_i == entry_i) add back the same-day trades on that date
+    same_day = np.sort(starts[ends == starts])
+    if len(same_day):
+        at_date = np.searchsorted(same_day, starts, "right") - np.searchsorted(same_day, starts, "left")
+        active_trades += np.where(ends == starts, at_date, 0)
+
+    # Check which trades bring the overlap to full allocation; each one gets the
+    # next group id in row order and highlights itself
+    qualifying = np.flatnonzero(active_trades * allocation >= 1.0)
+    highlight = np.zeros(len(trades_df), dtype=bool)
+    highlight[qualifying] = True
+
+    # Each qualifying trade stamps its group on every trade overlapping it and later
+    # groups overwrite earlier ones, so a trade ends up in the group of the last
+    # qualifying row overlapping it (-1: none)
+    limit = np.searchsorted(starts, ends, "left")
+    by_exit = qualifying[np.argsort(-ends[qualifying], kind="mergesort")]
+    by_entry = np.argsort(-starts, kind="mergesort")
+    last = _last_qualifying_overlap(starts, ends, by_exit, by_entry, limit)
+    group_col = np.full(len(trades_df), None, dtype=object)
+    has_group = last >= 0
+    group_col[has_group] = (np.searchsorted(qualifying, last[has_group]) + 1).tolist()
+
+    trades_df["group_id"] = group_col
+    trades_df["highlight"] = highlight
     return trades_df
 
 
@@ -136,43 +251,20 @@ def main():
     avg_trade = trades_df["return"].mean()
     exit_counts = trades_df["exit_reason"].value_counts()
 
-    equity_df["returns"] = equity_df["equity"].pct_change().fillna(0)
-    sharpe_ratio = calculate_sharpe_ratio(equity_df["returns"])
-    max_drawdown = calculate_max_drawdown(equity_df["equity"])
+    sharpe_ratio, max_drawdown = calculate_equity_stats(equity_df["equity"].to_numpy())
 
     trades_path = f"reports/trades_{timestamp}.csv"
     trades_df.to_csv(trades_path, index=False)
 
     # === Build HTML Table ===
-    trades_html = """
-    <table>
-        <tr>
-            <th>Group</th><th>Symbol</th><th>Entry Date</th><th>Exit Date</th>
-            <th>Entry Price</th><th>Exit Price</th><th>Return</th><th>Exit Reason</th>
-        </tr>
-    """
-
-    for _, row in trades_df.iterrows():
-        row_style = ' style="background-color:#e3f2fd;"' if row["highlight"] else ""
-        group_id = row["group_id"] if pd.notna(row["group_id"]) else ""
-        trades_html += f"""
-        <tr{row_style}>
-            <td>{group_id}</td>
-            <td>{row['symbol']}</td>
-            <td>{row['entry_date'].date()}</td>
-            <td>{row['exit_date'].date()}</td>
-            <td>{row['entry_price']:.2f}</td>
-            <td>{row['exit_price']:.2f}</td>
-            <td>{row['return']:.4f}</td>
-            <td>{row['exit_reason']}</td>
-        </tr>
-        """
-    trades_html += "</table>"
+    trades_html = generate_trades_table_html(trades_df)
 
     plot_html = generate_plotly_equity_curve(equity_df)
 
     html_path = f"reports/backtest_report_{timestamp}.html"
-    html_content = f"""
+    # Assemble the page from parts and stream them to disk; the large plot and
+    # trades fragments are never copied into one combined string.
+    html_head = f"""
     <html>
     <head>
         <title>Backtest Report - {timestamp}</title>
@@ -200,16 +292,23 @@ def main():
         </ul>
         <h3>Exit Breakdown:</h3>
         {exit_counts.to_frame().to_html(header=False)}
-        <h3>Equity Curve:</h3>{plot_html}
+        <h3>Equity Curve:</h3>"""
+    html_parts = [
+        html_head,
+        plot_html,
+        """
         <h3>All Trades:</h3>
         <p>🟦 = trade that completed full allocation for its group.</p>
-        {trades_html}
+        """,
+        trades_html,
+        """
     </body>
     </html>
-    """
+    """,
+    ]
 
     with open(html_path, "w", encoding="utf-8") as f:
-        f.write(html_content)
+        f.writelines(html_parts)
 
     print(f"\n✅ Report saved to: {html_path}")
     print(f"💾 All trades saved to: {trades_path}")
@@ -0,0 +1,20 @@
+"""
+Optional Numba support.
+When numba is installed, `njit` is the real JIT decorator; otherwise it is a
+no-op so the simulation kernels still run as plain Python.
+"""
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:  # pragma: no cover - depends on environment
+    NUMBA_AVAILABLE = False
+
+    def njit(*args, **kwargs):
+        # Support both @njit and @njit(cache=True, ...)
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+
+        def decorator(func):
+            return func
+        return decorator
@@ -1,5 +1,118 @@
 import pandas as pd
-from typing import Dict, Any, List
+import numpy as np
+from collections import OrderedDict
+from typing import Tuple
+
+from backtester import EXIT_REASONS
+from data_loader import load_price_data
+from numba_compat import njit
+
+
+@njit(cache=True)
+def _simulate_portfolio(piv_open, piv_close, entry_mask, alloc, sl, tp, start_cap):
+    """
+    Day-by-day portfolio simulation over (date x symbol) matrices.
+    entry_mask[i, j] marks symbols whose open is far enough below the trailing high.
+    Returns the daily equity curve plus flat trade arrays (first `count` rows
+    filled), ordered by exit day and then by the order positions were opened.
+    reason codes follow backtester.EXIT_REASONS: 1 = take_profit, 2 = stop_loss.
+    """
+    num_days, num_symbols = piv_close.shape
+    max_slots = min(num_symbols, int(1.0 // alloc) + 1)
+    cap = num_days * max_slots + 1
+
+    trade_sym = np.empty(cap, dtype=np.int64)
+    trade_entry_idx = np.empty(cap, dtype=np.int64)
+    trade_exit_idx = np.empty(cap, dtype=np.int64)
+    trade_entry_px = np.empty(cap, dtype=np.float64)
+    trade_exit_px = np.empty(cap, dtype=np.float64)
+    trade_ret = np.empty(cap, dtype=np.float64)
+    trade_reason = np.empty(cap, dtype=np.int8)
+    equity = np.empty(num_days, dtype=np.float64)
+
+    # Open positions, one slot per symbol column
+    held = np.zeros(num_symbols, dtype=np.bool_)
+    shares = np.zeros(num_symbols, dtype=np.float64)
+    entry_price = np.ones(num_symbols, dtype=np.float64)
+    entry_idx = np.zeros(num_symbols, dtype=np.int64)
+    exiting = np.empty(num_symbols, dtype=np.int64)
+    exit_codes = np.zeros(num_symbols, dtype=np.int8)
+
+    cash = start_cap
+    invest_amt = start_cap * alloc
+    open_trades = 0
+    count = 0
+    has_candidates = np.zeros(num_days, dtype=np.bool_)
+    for i in range(num_days):
+        for j in range(num_symbols):
+            if entry_mask[i, j]:
+                has_candidates[i] = True
+                break
+
+    for i in range(num_days):
+        # ---- exit positions ----
+        n_exit = 0
+        for j in range(num_symbols):
+            if not held[j]:
+                continue
+            ret = piv_close[i, j] / entry_price[j] - 1.0
+            if ret >= tp:
+                exit_codes[j] = 1
+            elif ret <= -sl:
+                exit_codes[j] = 2
+            else:
+                continue  # still open (or no price today)
+            exiting[n_exit] = j
+            n_exit += 1
+
+        if n_exit > 0:
+            # keep the ledger in the order positions were opened
+            day_exits = exiting[:n_exit]
+            day_exits = day_exits[np.argsort(entry_idx[day_exits], kind="mergesort")]
+            for j in day_exits:
+                price = piv_close[i, j]
+                cash += price * shares[j]
+                trade_sym[count] = j
+                trade_entry_idx[count] = entry_idx[j]
+                trade_exit_idx[count] = i
+                trade_entry_px[count] = entry_price[j]
+                trade_exit_px[count] = price
+                trade_ret[count] = price / entry_price[j] - 1.0
+                trade_reason[count] = exit_codes[j]
+                count += 1
+                held[j] = False
+                shares[j] = 0.0
+                open_trades -= 1
+
+        # ---- entry conditions ----
+        if open_trades * alloc < 1.0 and has_candidates[i]:
+            available_fraction = 1.0 - (open_trades * alloc)
+            max_new = int(available_fraction // alloc)
+            taken = 0
+            for j in range(num_symbols):
+                if taken >= max_new:
+                    break
+                if held[j] or not entry_mask[i, j]:
+                    continue
+                taken += 1
+                if cash < invest_amt:
+                    continue
+                cash -= invest_amt
+                held[j] = True
+                shares[j] = invest_amt / piv_open[i, j]
+                entry_price[j] = piv_open[i, j]
+                entry_idx[j] = i
+                open_trades += 1
+
+        # ---- update equity ----
+        mkt_val = 0.0
+        for j in range(num_symbols):
+            if held[j] and not np.isnan(piv_close[i, j]):
+                mkt_val += shares[j] * piv_close[i, j]
+        equity[i] = cash + mkt_val
+
+    return (equity, trade_sym, trade_entry_idx, trade_exit_idx, trade_entry_px,
+            trade_exit_px, trade_ret, trade_reason, count)
 
 
 class PortfolioBacktester:
@@ -9,30 +122,38 @@ class PortfolioBacktester:
     Exits on take-profit or stop-loss.
     """
 
+    MATRIX_CACHE_SIZE = 32
+
     def __init__(self, csv_path: str, starting_capital: float = 100_000.0):
         self.csv_path = csv_path
         self.starting_capital = starting_capital
         self.data = self._load_and_prepare_data(csv_path)
+        # LRU caches: pivots per sector, trailing high / drop per (sector, lookback)
+        self._pivot_cache: "OrderedDict[str, tuple]" = OrderedDict()
+        self._drop_cache: "OrderedDict[Tuple[str, int], tuple]" = OrderedDict()
+
+    def _cached(self, cache: OrderedDict, key, build):
+        if key in cache:
+            cache.move_to_end(key)
+            return cache[key]
+        value = build()
+        cache[key] = value
+        if len(cache) > self.MATRIX_CACHE_SIZE:
+            cache.popitem(last=False)
+        return value
 
     # -------------------------------------------------------------
     def _load_and_prepare_data(self, csv_path: str) -> pd.DataFrame:
-        df = pd.read_csv(csv_path)
-        df.columns = [c.lower().strip() for c in df.columns]
-
-        rename_map = {
-            "ticker": "symbol",
-            "closeprice": "close",
-            "openprice": "open"
-        }
-        df.rename(columns=rename_map, inplace=True)
+        # columns normalized + renamed, dates parsed (cached as parquet)
+        df = load_price_data(csv_path)
 
         required_cols = {"date", "symbol", "close", "open"}
         missing = required_cols - set(df.columns)
         if missing:
             raise ValueError(f"Missing required columns in CSV: {missing}")
 
-        df["date"] = pd.to_datetime(df["date"], errors="coerce")
         df.dropna(subset=["date", "symbol", "open", "close"], inplace=True)
+        df.drop_duplicates(subset=["symbol", "date"], inplace=True)
         df.sort_values(["symbol", "date"], inplace=True)
 
         if "sector" in df.columns:
@@ -40,8 +161,65 @@ class PortfolioBacktester:
         else:
             df["sector"] = "unknown"
 
+        # categorical symbols: integer codes instead of one Python string per row
+        # (prices stay float64, the simulation matrices are float64 anyway)
+        df["symbol"] = df["symbol"].astype("category")
+
         return df
 
+    # -------------------------------------------------------------
+    def _sector_pivots(self, sector_name: str):
+        """
+        (date x symbol) open/close matrices for one sector, independent of lookback.
+        Returns (long-form sector rows, dates, symbols, open, close).
+        """
+        df = self.data[self.data["sector"].str.lower() == sector_name]
+        if df.empty:
+            raise ValueError(f"No data found for sector '{sector_name}'")
+        # keep other sectors' tickers out of the pivot columns
+        df = df.assign(symbol=df["symbol"].cat.remove_unused_categories())[["date", "symbol", "open", "close"]]
+
+        # Pivot to dense (date x symbol) matrices so each day is a row slice
+        # instead of a boolean scan over the whole sector frame.
+        # pandas hands back column-major data; force C order so row reads are contiguous.
+        piv_close_df = df.pivot(index="date", columns="symbol", values="close")
+        dates = piv_close_df.index.to_numpy()
+        symbols = piv_close_df.columns.to_numpy()
+        piv_close = np.ascontiguousarray(piv_close_df.to_numpy(), dtype=np.float64)
+        piv_open = np.ascontiguousarray(
+            df.pivot(index="date", columns="symbol", values="open").to_numpy(), dtype=np.float64)
+        return df, dates, symbols, piv_open, piv_close
+
+    def _sector_matrices(self, sector_name: str, lookback_days: int):
+        """
+        Sector pivots plus trailing high / drop matrices. Pivots are memoized per
+        sector and the lookback-dependent matrices per (sector, lookback), so
+        parameter sweeps skip the filtering, pivoting and trailing-high work.
+        Returns (dates, symbols, open, close, trailing_high, drop_from_high).
+        """
+        sector = sector_name.lower()
+        df, dates, symbols, piv_open, piv_close = self._cached(
+            self._pivot_cache, sector, lambda: self._sector_pivots(sector))
+
+        def build_drop():
+            # ✅ compute trailing high (exclude today's price) over each symbol's own
+            # rows, so a gap in one ticker doesn't shorten its window in calendar days
+            prev_close = df.groupby("symbol", observed=True, sort=False)["close"].shift(1)
+            rolling_high = (prev_close.groupby(df["symbol"], observed=True, sort=False)
+                            .rolling(lookback_days, min_periods=1).max()
+                            .reset_index(level=0, drop=True))
+            trailing_high = np.ascontiguousarray(
+                df.assign(trailing_high=rolling_high)
+                  .pivot(index="date", columns="symbol", values="trailing_high")
+                  .to_numpy(), dtype=np.float64)
+            # compute drop condition based on open price
+            piv_drop = piv_open / trailing_high - 1.0
+            return trailing_high, piv_drop
+
+        trailing_high, piv_drop = self._cached(
+            self._drop_cache, (sector, lookback_days), build_drop)
+        return dates, symbols, piv_open, piv_close, trailing_high, piv_drop
+
     # -------------------------------------------------------------
     def run_sector_strategy(self,
                             sector_name: str,
@@ -55,96 +233,34 @@ class PortfolioBacktester:
         Uses trailing logic (previous N days only, no lookahead).
         """
 
-        df = self.data[self.data["sector"].str.lower() == sector_name.lower()].copy()
-        if df.empty:
-            raise ValueError(f"No data found for sector '{sector_name}'")
+        dates, col_symbols, piv_open, piv_close, trailing_high, piv_drop = \
+            self._sector_matrices(sector_name, int(lookback_days))
 
-        symbols = sorted(df["symbol"].unique().tolist())
+        symbols = col_symbols.tolist()
         print(f"Running strategy for sector '{sector_name}' on {len(symbols)} symbols...")
 
-        # ✅ compute trailing high (exclude today's price)
-        df["trailing_high"] = df.groupby("symbol")["close"].transform(
-            lambda x: x.shift(1).rolling(int(lookback_days), min_periods=1).max()
-        )
-
-        # compute drop condition based on open price
-        df["drop_from_high"] = (df["open"] / df["trailing_high"]) - 1.0
-
-        cash = float(self.starting_capital)
-        equity_curve: List[Dict[str, Any]] = []
-        positions: Dict[str, Dict[str, Any]] = {}
-        trades: List[Dict[str, Any]] = []
-
-        dates = sorted(df["date"].unique())
+        # NaN drops never qualify
+        entry_mask = piv_drop <= -drop_pct
 
-        for date in dates:
-            day_data = df[df["date"] == date]
-
-            # ---- exit positions ----
-            for sym in list(positions.keys()):
-                pos = positions[sym]
-                sub = day_data[day_data["symbol"] == sym]
-                if sub.empty:
-                    continue
-                price = float(sub.iloc[0]["close"])
-                ret = (price / pos["entry_price"]) - 1.0
-
-                if ret >= take_profit:
-                    exit_reason = "take_profit"
-                elif ret <= -stop_loss:
-                    exit_reason = "stop_loss"
-                else:
-                    continue  # still open
-
-                proceeds = price * pos["shares"]
-                cash += proceeds
-                trades.append({
-                    "symbol": sym,
-                    "entry_date": pos["entry_date"],
-                    "exit_date": date,
-                    "entry_price": pos["entry_price"],
-                    "exit_price": price,
-                    "return": ret,
-                    "exit_reason": exit_reason
-                })
-                del positions[sym]
-
-            # ---- entry conditions ----
-            open_trades = len(positions)
-            if open_trades * allocation_per_trade < 1.0:
-                candidates = day_data[
-                    (day_data["drop_from_high"] <= -drop_pct) &
-                    (~day_data["symbol"].isin(positions.keys()))
-                ]
-                if not candidates.empty:
-                    available_fraction = 1.0 - (open_trades * allocation_per_trade)
-                    max_new = int(available_fraction // allocation_per_trade)
-                    for _, row in candidates.head(max_new).iterrows():
-                        invest_amt = self.starting_capital * allocation_per_trade
-                        if cash < invest_amt:
-                            continue
-                        shares = invest_amt / float(row["open"])
-                        cash -= invest_amt
-                        positions[row["symbol"]] = {
-                            "entry_price": float(row["open"]),
-                            "shares": float(shares),
-                            "entry_date": date
-                        }
-
-            # ---- update equity ----
-            mkt_val = 0.0
-            for sym, pos in positions.items():
-                sub = day_data[day_data["symbol"] == sym]
-                if sub.empty:
-                    continue
-                mkt_val += pos["shares"] * float(sub.iloc[0]["close"])
-
-            equity_curve.append({"date": date, "equity": cash + mkt_val})
+        (equity, trade_sym, trade_entry_idx, trade_exit_idx, trade_entry_px,
+         trade_exit_px, trade_ret, trade_reason, k) = _simulate_portfolio(
+            piv_open, piv_close, entry_mask, float(allocation_per_trade),
+            float(stop_loss), float(take_profit), float(self.starting_capital),
+        )
 
-        equity_df = pd.DataFrame(equity_curve)
-        total_return = equity_df["equity"].iloc[-1] / self.starting_capital - 1.0
+        equity_df = pd.DataFrame({"date": dates, "equity": equity})
+        final_equity = float(equity[-1])
+        total_return = final_equity / self.starting_capital - 1.0
 
-        trades_df = pd.DataFrame(trades)
+        trades_df = pd.DataFrame({
+            "symbol": col_symbols[trade_sym[:k]],
+            "entry_date": dates[trade_entry_idx[:k]],
+            "exit_date": dates[trade_exit_idx[:k]],
+            "entry_price": trade_entry_px[:k],
+            "exit_price": trade_exit_px[:k],
+            "return": trade_ret[:k],
+            "exit_reason": EXIT_REASONS[trade_reason[:k]],
+        })
         if not trades_df.empty:
             earliest = trades_df["entry_date"].min().date()
             latest = trades_df["exit_date"].max().date()
@@ -152,12 +268,12 @@ class PortfolioBacktester:
         else:
             print("⚠️ No trades triggered. Try smaller drop_pct or longer lookback_days.")
 
-        print(f"Final Equity: ${equity_df['equity'].iloc[-1]:,.2f}  |  Total Return {total_return:.2%}")
+        print(f"Final Equity: ${final_equity:,.2f}  |  Total Return {total_return:.2%}")
 
         return {
             "equity": equity_df,
             "trades": trades_df,
-            "final_equity": float(equity_df['equity'].iloc[-1]),
+            "final_equity": final_equity,
             "total_return": float(total_return),
             "sector": sector_name,
             "symbols": symbols
@@ -1,5 +1,130 @@
 import re
-from typing import Dict, Any, Optional
+from dataclasses import dataclass, replace
+from functools import lru_cache
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+try:
+    import ahocorasick
+except ImportError:  # optional: fall back to one substring test per symbol
+    ahocorasick = None
+
+
+_TICKER_CANDIDATE_RE = re.compile(r"\b[A-Z]{1,5}\b")
+_WORD_CHAR_RE = re.compile(r"\w")
+
+
+@lru_cache(maxsize=4096)
+def _symbol_word_re(sym_lower: str) -> re.Pattern:
+    # whole-word matcher for one known symbol, reused across parses
+    return re.compile(rf"\b{re.escape(sym_lower)}\b")
+
+
+def _build_automaton(words: Iterable[str]):
+    # payload is (list position, length): the earliest listed word still wins
+    # when several are present, and the length gives the start of each hit
+    automaton = ahocorasick.Automaton()
+    for rank, word in enumerate(words):
+        word = word.lower()
+        if word and word not in automaton:
+            automaton.add_word(word, (rank, len(word)))
+    automaton.make_automaton()
+    return automaton
+
+
+@lru_cache(maxsize=32)
+def _lowered_symbols(known_symbols: Tuple[str, ...]) -> Tuple[Tuple[str, str], ...]:
+    # (lower, upper) per known symbol, computed once per universe
+    return tuple((sym.lower(), sym.upper()) for sym in known_symbols)
+
+
+@lru_cache(maxsize=32)
+def _symbol_automaton(known_symbols: Tuple[str, ...]):
+    return _build_automaton(known_symbols)
+
+
+@lru_cache(maxsize=32)
+def _name_automaton(symbol_names: Tuple[Tuple[str, str], ...]):
+    return _build_automaton(name for name, _ in symbol_names)
+
+
+def _remove_spans(text: str, spans: List[Tuple[int, int]]) -> str:
+    pieces = []
+    prev = 0
+    for start, end in spans:
+        pieces.append(text[prev:start])
+        prev = end
+    pieces.append(text[prev:])
+    return "".join(pieces)
+
+
+def _is_word_boundary(text: str, i: int) -> bool:
+    # same test as regex \b at position i
+    before = i > 0 and _WORD_CHAR_RE.match(text, i - 1) is not None
+    after = i < len(text) and _WORD_CHAR_RE.match(text, i) is not None
+    return before != after
+
+
+@dataclass(frozen=True, slots=True)
+class Condition:
+    metric: Optional[str] = None
+    direction: Optional[str] = None
+    threshold: Optional[float] = None
+    period_days: Optional[int] = None
+    stop_loss: Optional[float] = None
+    take_profit: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        d = {
+            "metric": self.metric,
+            "direction": self.direction,
+            "threshold": self.threshold,
+            "period_days": self.period_days
+        }
+        # stop/take only appear on exit rules that have them
+        if self.stop_loss is not None:
+            d["stop_loss"] = self.stop_loss
+        if self.take_profit is not None:
+            d["take_profit"] = self.take_profit
+        return d
+
+
+@dataclass(frozen=True, slots=True)
+class Rule:
+    action: Optional[str] = None
+    symbol: Optional[str] = None
+    condition: Condition = Condition()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"action": self.action, "symbol": self.symbol, "condition": self.condition.to_dict()}
+
+
+@dataclass(frozen=True, slots=True)
+class ParsedStrategy:
+    """
+    Immutable parse result; safe to share from the parse cache.
+    to_dict() gives the plain-dict layout returned by StrategyParser.parse().
+    """
+    entry: Optional[Rule] = None
+    exit: Optional[Rule] = None
+    sector: Optional[str] = None
+    allocation: Optional[float] = None
+    stop_loss: Optional[float] = None
+    take_profit: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        result = {
+            "entry": self.entry.to_dict() if self.entry else None,
+            "exit": self.exit.to_dict() if self.exit else None
+        }
+        if self.sector:
+            result["sector"] = self.sector
+        if self.allocation:
+            result["allocation"] = self.allocation
+        if self.stop_loss:
+            result["stop_loss"] = self.stop_loss
+        if self.take_profit:
+            result["take_profit"] = self.take_profit
+        return result
 
 
 class StrategyParser:
@@ -13,7 +138,7 @@ class StrategyParser:
       - Capital allocation phrases ("buy with 50% of capital")
     """
 
-    ACTIONS = {"buy", "sell", "short", "cover"}
+    ACTIONS = frozenset({"buy", "sell", "short", "cover"})
 
     TIME_UNITS = {
         "day": 1, "days": 1,
@@ -28,6 +153,35 @@ class StrategyParser:
         "fifteen": 15, "twenty": 20, "thirty": 30
     }
 
+    # Patterns are compiled once with the class; parse() only runs them.
+    # sector names are capped at five words; bounded repeats keep a long rule
+    # without a closing "sector"/"industry" from backtracking across the whole text
+    _SECTOR_RE = re.compile(
+        r"(?:using|for|in)\s+(?:all\s+tickers\s+in|the)?\s*((?:\w+\s+){0,4}?\w+)\s+(?:sector|industry)")
+    _SPLIT_RE = re.compile(r"\b(?:and then|then|and after|and)\b")
+    _ACTION_RE = re.compile(rf"\b(?:{'|'.join(sorted(ACTIONS))})\b")
+    _DIR_DOWN_RE = re.compile(r"\b(?:drop|drops|down|fall|falls|decrease|plunge)\b")
+    _DIR_UP_RE = re.compile(r"\b(?:rise|rises|up|gain|gains|increase)\b")
+    _PCT_RE = re.compile(r"(\d+(?:\.\d+)?)\s*%|\b(\d+(?:\.\d+)?)\s*(?:percent|percentage)\b")
+    # the count is any digit run or whole word, resolved through NUMBER_WORDS
+    # after the match; \b keeps the word branch from restarting at every letter
+    _PERIOD_PREFIXED_RE = re.compile(
+        r"\b(?:in|within|over|from|past)\s+(?P<num>\d+|[a-z]+)[-\s]{0,2}(?P<unit>day|week|month)s?\b")
+    _PERIOD_RE = re.compile(r"(?P<num>\d+|\b[a-z]+)[-\s]{0,2}(?P<unit>day|week|month)s?\b")
+    # first 2-6 letter upper-case word that isn't an action ("BUY AAPL" -> AAPL)
+    _SYMBOL_RE = re.compile(rf"\b(?!(?:{'|'.join(sorted(a.upper() for a in ACTIONS))})\b)[A-Z]{{2,6}}\b")
+    _STOP_RE = re.compile(r"(?:stop\s*loss|stoploss|falls?\s+another)\s*(\d+(?:\.\d+)?)\s*%")
+    _TAKE_RE = re.compile(r"(?:take\s*profit|tp|rises?\s+another)\s*(\d+(?:\.\d+)?)\s*%")
+    _ALLOC_RE = re.compile(r"(\d+(?:\.\d+)?)\s*%?\s*(?:percent)?\s*(?:of\s+)?(?:the\s+)?capital")
+
+    # set by compile_for_universe()
+    _known_symbols_key: Optional[Tuple[str, ...]] = None
+
+    def __init__(self):
+        # per-instance memo of _parse_uncached; a cache on the method itself would be
+        # process-wide, keyed on self, and keep every parser alive
+        self._parse_cached = lru_cache(maxsize=1024)(self._parse_uncached)
+
     def parse(
         self,
         text: str,
@@ -37,48 +191,121 @@ class StrategyParser:
         """
         Main NLP entrypoint.
         Detects sector-wide phrasing, entry/exit rules, stop-loss, take-profit, and allocation.
+        Results are memoized per (text, symbol_map, known_symbols); each call gets fresh dicts.
         """
-        text = text.strip().lower()
+        return self.parse_structured(text, symbol_map, known_symbols).to_dict()
 
-        # Detect sector
-        sector_match = re.search(
-            r"(?:using|for|in)\s+(?:all\s+tickers\s+in|the)?\s*([\w\s]+?)\s+(?:sector|industry)", text)
-        sector_name = None
-        if sector_match:
-            sector_name = sector_match.group(1).strip()
-            text = re.sub(
-                r"(?:using|for|in)\s+(?:all\s+tickers\s+in|the)?\s*[\w\s]+?\s+(?:sector|industry)", "", text)
+    def parse_structured(
+        self,
+        text: str,
+        symbol_map: Optional[Dict[str, str]] = None,
+        known_symbols: Optional[list] = None
+    ) -> ParsedStrategy:
+        """
+        Same as parse(), but returns the cached immutable ParsedStrategy itself.
+        """
+        return self._parse_cached(text, *self._cache_keys(symbol_map, known_symbols))
 
-        # Split entry/exit
-        parts = re.split(r"\b(?:and then|then|and after|and)\b", text)
-        entry_text = parts[0].strip()
-        exit_text = parts[1].strip() if len(parts) > 1 else None
+    def parse_batch(
+        self,
+        texts: Iterable[str],
+        symbol_map: Optional[Dict[str, str]] = None,
+        known_symbols: Optional[list] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Parses many rules against one symbol universe, e.g. a generated rule grid.
+        The symbol keys are built once for the whole batch instead of once per rule.
+        """
+        symbol_map_key, known_symbols_key = self._cache_keys(symbol_map, known_symbols)
+        return [self._parse_cached(text, symbol_map_key, known_symbols_key).to_dict() for text in texts]
 
-        entry = self._parse_single(entry_text, symbol_map, known_symbols)
-        exit_rule = self._parse_single(exit_text, symbol_map, known_symbols) if exit_text else None
+    def compile_for_universe(self, known_symbols: list) -> "StrategyParser":
+        """
+        Fixes the symbol universe for this parser (e.g. the S&P 500 tickers).
+        Later calls that pass no known_symbols use it, and its symbol matcher is
+        built here instead of on the first parse.
+        """
+        self._known_symbols_key = tuple(known_symbols) if known_symbols else None
+        if self._known_symbols_key:
+            if ahocorasick is not None:
+                _symbol_automaton(self._known_symbols_key)
+            else:
+                _lowered_symbols(self._known_symbols_key)
+        return self
+
+    def _cache_keys(
+        self,
+        symbol_map: Optional[Dict[str, str]],
+        known_symbols: Optional[list]
+    ) -> Tuple[Optional[Tuple[Tuple[str, str], ...]], Optional[Tuple[str, ...]]]:
+        # hashable lru_cache keys; no known_symbols means the compiled universe, if any
+        symbol_map_key = tuple(symbol_map.items()) if symbol_map else None
+        known_symbols_key = tuple(known_symbols) if known_symbols else self._known_symbols_key
+        return symbol_map_key, known_symbols_key
+
+    def _parse_uncached(
+        self,
+        text: str,
+        symbol_map_key: Optional[Tuple[Tuple[str, str], ...]],
+        known_symbols_key: Optional[Tuple[str, ...]]
+    ) -> ParsedStrategy:
+        original = text.strip()
+        text = original.lower()
+        if len(text) != len(original):
+            # a few non-ASCII letters change length when lower-cased; the
+            # slices below need both strings aligned
+            original = text
+
+        # Detect sector; most rules never mention one, so check for the closing
+        # keyword before running the backtracking-prone pattern at all
+        sector_name = None
+        spans = []
+        if "sector" in text or "industry" in text:
+            # one scan: the first phrase names the sector, every phrase is removed
+            for m in self._SECTOR_RE.finditer(text):
+                if not spans:
+                    sector_name = m.group(1).strip()
+                spans.append(m.span())
+        if spans:
+            # cut the sector phrases out of both strings at the same offsets
+            text = _remove_spans(text, spans)
+            original = _remove_spans(original, spans)
+
+        # Split entry/exit; the original casing rides along for ticker detection
+        split = self._SPLIT_RE.search(text)
+        if split:
+            entry_text = text[:split.start()].strip()
+            entry_original = original[:split.start()].strip()
+            exit_text = text[split.end():].strip()
+            exit_original = original[split.end():].strip()
+        else:
+            entry_text, entry_original = text.strip(), original.strip()
+            exit_text = exit_original = None
+
+        # lower-case the company names once for both rule segments
+        symbol_names = tuple((name.lower(), ticker) for name, ticker in symbol_map_key) if symbol_map_key else None
+
+        entry = self._parse_single(entry_text, entry_original, symbol_names, known_symbols_key)
+        exit_rule = (self._parse_single(exit_text, exit_original, symbol_names, known_symbols_key)
+                     if exit_text else None)
 
         # Extract stoploss, takeprofit, allocation globally
         stop_loss, take_profit = self._extract_stop_take(text)
         allocation = self._extract_allocation(text)
 
-        # Add to exit rule if not already
-        if exit_rule:
-            if stop_loss and not exit_rule["condition"].get("stop_loss"):
-                exit_rule["condition"]["stop_loss"] = stop_loss
-            if take_profit and not exit_rule["condition"].get("take_profit"):
-                exit_rule["condition"]["take_profit"] = take_profit
-
-        result = {"entry": entry, "exit": exit_rule}
-        if sector_name:
-            result["sector"] = sector_name
-        if allocation:
-            result["allocation"] = allocation
-        if stop_loss:
-            result["stop_loss"] = stop_loss
-        if take_profit:
-            result["take_profit"] = take_profit
-
-        return result
+        # Add to exit rule
+        if exit_rule and (stop_loss or take_profit):
+            exit_rule = replace(exit_rule, condition=replace(
+                exit_rule.condition, stop_loss=stop_loss or None, take_profit=take_profit or None))
+
+        return ParsedStrategy(
+            entry=entry,
+            exit=exit_rule,
+            sector=sector_name,
+            allocation=allocation,
+            stop_loss=stop_loss,
+            take_profit=take_profit
+        )
 
     # ----------------------------------------------------------------------
     # Parse a single rule
@@ -86,112 +313,120 @@ class StrategyParser:
     def _parse_single(
         self,
         text: Optional[str],
-        symbol_map: Optional[Dict[str, str]],
-        known_symbols: Optional[list]
-    ) -> Optional[Dict[str, Any]]:
+        original_text: Optional[str],
+        symbol_names: Optional[Tuple[Tuple[str, str], ...]],
+        known_symbols: Optional[Tuple[str, ...]]
+    ) -> Optional[Rule]:
+        # text is the lower-cased segment, original_text the same slice as typed
         if not text:
             return None
 
-        original_text = text
-        text = text.lower()
-
-        result = {
-            "action": None,
-            "symbol": None,
-            "condition": {
-                "metric": None,
-                "direction": None,
-                "threshold": None,
-                "period_days": None
-            }
-        }
-
         # Action
-        for a in self.ACTIONS:
-            if re.search(rf"\b{a}\b", text):
-                result["action"] = a
-                break
+        m_action = self._ACTION_RE.search(text)
+        action = m_action.group() if m_action else None
 
         # Symbol
         symbol = self._extract_symbol(original_text)
         if not symbol:
             symbol = self._extract_symbol_from_known(text, known_symbols)
-        if not symbol and symbol_map:
-            for name, ticker in symbol_map.items():
-                if name.lower() in text:
-                    symbol = ticker
-                    break
-        result["symbol"] = symbol
+        if not symbol and symbol_names:
+            symbol = self._extract_symbol_from_names(text, symbol_names)
 
         # Direction
-        if re.search(r"\b(drop|drops|down|fall|falls|decrease|plunge)\b", text):
-            result["condition"]["direction"] = "down"
-        elif re.search(r"\b(rise|rises|up|gain|gains|increase)\b", text):
-            result["condition"]["direction"] = "up"
+        direction = None
+        if self._DIR_DOWN_RE.search(text):
+            direction = "down"
+        elif self._DIR_UP_RE.search(text):
+            direction = "up"
 
         # Threshold (%)
-        m_pct = re.search(
-            r"(\d+(?:\.\d+)?)\s*%|\b(\d+(?:\.\d+)?)\s*(percent|percentage)\b", text)
+        threshold = None
+        m_pct = self._PCT_RE.search(text)
         if m_pct:
-            val = m_pct.group(1) or m_pct.group(2)
-            result["condition"]["threshold"] = float(val) / 100.0
-
-        # Period (days/weeks)
-        m_period = re.search(
-            r"\b(in|within|over|from|past)\s+(?P<num>\d+|one|two|three|four|five|six|seven|eight|nine|ten|eleven|twelve|thirteen|fourteen|fifteen|twenty|thirty)\s*(?P<unit>day|days|week|weeks|month|months)\b",
-            text
+            threshold = float(m_pct.group(1) or m_pct.group(2)) / 100.0
+
+        # Period: "in/within/over... N days" beats a bare "N-day"
+        period_days = None
+        if "day" in text or "week" in text or "month" in text:
+            period_days = self._extract_period(self._PERIOD_PREFIXED_RE, text)
+            if period_days is None:
+                period_days = self._extract_period(self._PERIOD_RE, text)
+
+        metric = "price_change" if threshold is not None else None
+        return Rule(
+            action=action,
+            symbol=symbol,
+            condition=Condition(metric, direction, threshold, period_days)
         )
-        if not m_period:
-            m_period = re.search(
-                r"(?P<num>\d+|one|two|three|four|five|six|seven|eight|nine|ten|eleven|twelve|thirteen|fourteen|fifteen|twenty|thirty)[-\s]*(?P<unit>day|days|week|weeks|month|months)",
-                text
-            )
-        if m_period:
-            num_raw = m_period.group("num")
-            unit = m_period.group("unit")
-            num = int(num_raw) if num_raw.isdigit() else self.NUMBER_WORDS.get(num_raw, None)
-            if num is not None:
-                result["condition"]["period_days"] = num * self.TIME_UNITS[unit]
-
-        if result["condition"]["threshold"] is not None:
-            result["condition"]["metric"] = "price_change"
-
-        return result
 
     # ----------------------------------------------------------------------
     # Helpers
     # ----------------------------------------------------------------------
     def _extract_symbol(self, original_text: str) -> Optional[str]:
-        tokens = re.findall(r"\b[A-Z]{1,6}\b", original_text)
-        for token in tokens:
-            if token.lower() in self.ACTIONS:
-                continue
-            if len(token) >= 2:
-                return token
-        return None
+        m = self._SYMBOL_RE.search(original_text)
+        return m.group() if m else None
 
-    def _extract_symbol_from_known(self, lower_text: str, known_symbols: Optional[list]) -> Optional[str]:
+    def _extract_symbol_from_known(self, lower_text: str, known_symbols: Optional[Tuple[str, ...]]) -> Optional[str]:
         if not known_symbols:
             return None
-        for sym in known_symbols:
-            s = sym.lower()
-            if re.search(rf"\b{re.escape(s)}\b", lower_text):
-                return sym.upper()
+        if ahocorasick is not None:
+            # one pass over the text for the whole universe, then keep the
+            # earliest listed symbol that sits on word boundaries
+            best = None
+            for end, (rank, size) in _symbol_automaton(known_symbols).iter(lower_text):
+                if best is not None and rank >= best:
+                    continue
+                if _is_word_boundary(lower_text, end - size + 1) and _is_word_boundary(lower_text, end + 1):
+                    best = rank
+            return known_symbols[best].upper() if best is not None else None
+        for s, upper in _lowered_symbols(known_symbols):
+            # plain substring test first; the word-boundary regex only runs on a hit
+            if s in lower_text and _symbol_word_re(s).search(lower_text):
+                return upper
+        return None
+
+    def _extract_symbol_from_names(
+        self,
+        lower_text: str,
+        symbol_names: Tuple[Tuple[str, str], ...]
+    ) -> Optional[str]:
+        if ahocorasick is not None:
+            ranks = [rank for _, (rank, _) in _name_automaton(symbol_names).iter(lower_text)]
+            return symbol_names[min(ranks)][1] if ranks else None
+        for name, ticker in symbol_names:
+            if name in lower_text:
+                return ticker
+        return None
+
+    def _extract_period(self, pattern: re.Pattern, text: str) -> Optional[int]:
+        # first match whose count is a number; skips words like "few days"
+        for m in pattern.finditer(text):
+            num_raw = m.group("num")
+            num = int(num_raw) if num_raw.isdigit() else self.NUMBER_WORDS.get(num_raw)
+            if num is not None:
+                return num * self.TIME_UNITS[m.group("unit")]
         return None
 
     def _extract_stop_take(self, text: str):
         stop_loss = None
         take_profit = None
-        m_stop = re.search(r"(?:stop\s*loss|stoploss|falls?\s+another)\s*(\d+(?:\.\d+)?)\s*%", text)
-        m_take = re.search(r"(?:take\s*profit|tp|rises?\s+another)\s*(\d+(?:\.\d+)?)\s*%", text)
-        if m_stop:
-            stop_loss = float(m_stop.group(1)) / 100.0
-        if m_take:
-            take_profit = float(m_take.group(1)) / 100.0
+        # both patterns need a "%"; cheap substring checks skip the regex on most rules
+        if "%" not in text:
+            return stop_loss, take_profit
+        if "stop" in text or "another" in text:
+            m_stop = self._STOP_RE.search(text)
+            if m_stop:
+                stop_loss = float(m_stop.group(1)) / 100.0
+        if "profit" in text or "tp" in text or "another" in text:
+            m_take = self._TAKE_RE.search(text)
+            if m_take:
+                take_profit = float(m_take.group(1)) / 100.0
         return stop_loss, take_profit
 
     def _extract_allocation(self, text: str) -> Optional[float]:
-        match = re.search(r"(\d+(?:\.\d+)?)\s*%?\s*(?:percent)?\s*(?:of\s+)?(?:the\s+)?capital", text)
+        if "capital" not in text:
+            return None
+        match = self._ALLOC_RE.search(text)
         if match:
             val = float(match.group(1))
             if val > 1:
@@ -219,7 +454,7 @@ def detect_tickers_and_sector(user_input: str, master_data_path: str = "master_s
     available_sectors = set(master_df["Sector"].astype(str).str.lower().unique())
 
     # Extract potential tickers (uppercase words, 1–5 chars)
-    potential_tickers = re.findall(r'\b[A-Z]{1,5}\b', user_input.upper())
+    potential_tickers = _TICKER_CANDIDATE_RE.findall(user_input.upper())
     tickers_found = [t for t in potential_tickers if t in available_tickers]
 
     if tickers_found: